@@ -8,6 +8,26 @@ export const api = axios.create({
   },
 });
 
+// Read-your-writes: after a write the backend returns the database position
+// it reached (X-Write-LSN). Sending the latest one back keeps reads off a
+// replica that has not caught up yet, so e.g. a new chat shows up right away.
+const WRITE_LSN_HEADER = 'X-Write-LSN';
+const WRITE_LSN_KEY = 'write_lsn';
+
+const lsnValue = (lsn: string) => {
+  const [high, low] = lsn.split('/');
+  return (BigInt(`0x${high}`) << 32n) + BigInt(`0x${low}`);
+};
+
+const rememberWriteLsn = (lsn?: string) => {
+  if (!lsn || !/^[0-9A-Fa-f]{1,8}\/[0-9A-Fa-f]{1,8}$/.test(lsn)) return;
+  const current = localStorage.getItem(WRITE_LSN_KEY);
+  // Responses can arrive out of order: keep the newest position only
+  if (!current || lsnValue(lsn) > lsnValue(current)) {
+    localStorage.setItem(WRITE_LSN_KEY, lsn);
+  }
+};
+
 // Request interceptor to attach token
 api.interceptors.request.use(
   (config: InternalAxiosRequestConfig) => {
@@ -15,6 +35,10 @@ api.interceptors.request.use(
     if (token) {
       config.headers.Authorization = `Bearer ${token}`;
     }
+    const writeLsn = localStorage.getItem(WRITE_LSN_KEY);
+    if (writeLsn) {
+      config.headers[WRITE_LSN_HEADER] = writeLsn;
+    }
     return config;
   },
   (error) => Promise.reject(error)
@@ -22,7 +46,10 @@ api.interceptors.request.use(
 
 // Response interceptor to handle 401
 api.interceptors.response.use(
-  (response) => response,
+  (response) => {
+    rememberWriteLsn(response.headers[WRITE_LSN_HEADER.toLowerCase()]);
+    return response;
+  },
   (error: AxiosError) => {
     if (error.response?.status === 401) {
       localStorage.removeItem('access_token');
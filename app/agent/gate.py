@@ -0,0 +1,97 @@
+# app/agent/gate.py
+import re
+from app.core.config import settings
+from app.core.memory import PERSONAL_CUES, is_trivial
+
+# Optional: a small local classifier (any joblib-saved sklearn pipeline with
+# predict_proba over raw text). Without joblib or a model path, only heuristics run.
+try:
+    import joblib
+except ImportError:
+    joblib = None
+
+# Phrases that point back to something the user said before.
+MEMORY_CUES = re.compile(
+    r"\b(remember|recall|forgot|forget|last time|earlier|before|again|you said|i said|"
+    r"i told|told you|about me|who am i|what did i|what was|do you know|my|mine)\b"
+)
+
+_classifier = None
+_classifier_loaded = False
+
+def _load_classifier():
+    """Loads the optional classifier once; failures fall back to heuristics."""
+    global _classifier, _classifier_loaded
+    if _classifier_loaded:
+        return _classifier
+    _classifier_loaded = True
+    if joblib and settings.RETRIEVAL_GATE_MODEL_PATH:
+        try:
+            _classifier = joblib.load(settings.RETRIEVAL_GATE_MODEL_PATH)
+        except Exception as e:
+            print(f"Retrieval Gate Model Error: {e}")
+    return _classifier
+
+def should_retrieve(text: str) -> bool:
+    """
+    Cheap gate run before memory retrieval:
+    1. Trivial messages ("hi", "ok", emoji) never need memory.
+    2. Messages that refer back to the past always get it, and so do questions
+       about the user ("Where do I live?"), however short.
+    3. Otherwise the classifier decides if one is configured, else message length.
+    """
+    text = (text or "").strip()
+    if is_trivial(text):
+        return False
+    lowered = text.lower()
+    if MEMORY_CUES.search(lowered):
+        return True
+    if "?" in lowered and PERSONAL_CUES.search(lowered):
+        return True
+
+    classifier = _load_classifier()
+    if classifier is not None:
+        return classifier.predict_proba([text])[0][1] >= 0.5
+
+    return len(lowered.split()) >= settings.RETRIEVAL_GATE_MIN_WORDS
+
+# --- STATS ---
+# Per-process counters, exposed at GET /stats.
+retrieval_stats = {
+    "turns": 0,
+    "skipped": 0,
+    "memories_injected": 0,
+    "memories_dropped": 0,
+    "tokens_injected": 0,
+    "tokens_dropped": 0,
+}
+
+def estimate_tokens(texts: list) -> int:
+    """Rough token count (~4 characters per token), good enough for reporting."""
+    return sum(len(t) for t in texts) // 4
+
+def record_skip():
+    retrieval_stats["turns"] += 1
+    retrieval_stats["skipped"] += 1
+
+def record_retrieval(memories: list, dropped: list):
+    retrieval_stats["turns"] += 1
+    retrieval_stats["memories_injected"] += len(memories)
+    retrieval_stats["memories_dropped"] += len(dropped)
+    retrieval_stats["tokens_injected"] += estimate_tokens(memories)
+    retrieval_stats["tokens_dropped"] += estimate_tokens(dropped)
+
+def get_retrieval_stats() -> dict:
+    """
+    Skip rate and estimated prompt tokens saved. Skipped turns are credited with
+    the average a retrieval would have injected without the similarity cutoff.
+    """
+    stats = dict(retrieval_stats)
+    retrieved_turns = stats["turns"] - stats["skipped"]
+    avg_unfiltered = (
+        (stats["tokens_injected"] + stats["tokens_dropped"]) / retrieved_turns
+        if retrieved_turns else 0
+    )
+    stats["skip_rate"] = round(stats["skipped"] / stats["turns"], 3) if stats["turns"] else 0.0
+    stats["tokens_saved_estimate"] = int(stats["tokens_dropped"] + stats["skipped"] * avg_unfiltered)
+    return stats
@@ -1,12 +1,14 @@
 # app/agent/workflow.py
 import os
+import asyncio
 from typing import TypedDict, List, Annotated
 from dotenv import load_dotenv
 
 from langgraph.graph import StateGraph, END
 from langchain_google_genai import ChatGoogleGenerativeAI
 from langchain_core.messages import SystemMessage, BaseMessage
-from app.core.memory import retrieve_memory, save_memory # <--- NEW: Import Memory Tools
+from app.core.memory import search_memories, save_memory # <--- NEW: Import Memory Tools
+from app.agent.gate import should_retrieve, record_skip, record_retrieval
 import operator
 
 load_dotenv()
@@ -27,11 +29,53 @@ class AgentState(TypedDict):
     user_id: str
     chat_id: str # <--- NEW: We need this to filter memory by chat
     system_instruction: str
+    memories: List[str] # Filled by the retrieve node (empty when the gate skips), or pre-filled by the caller
+    persist_memory: bool # Defaults to True; False when the caller saves the memory itself (fan-out)
 
 # --- 3. DEFINE NODES ---
+def build_system_prompt(system_instruction: str, memories: List[str]) -> str:
+    """
+    Injects retrieved memories into the personality instructions.
+    With no memories the block is left out entirely to save prompt tokens.
+    """
+    if not memories:
+        return system_instruction
+
+    memory_text = "\nRELEVANT MEMORIES FROM PAST:\n" + "\n".join([f"- {m}" for m in memories])
+    return (
+        f"{system_instruction}\n"
+        f"----------------\n"
+        f"{memory_text}\n"
+        f"----------------\n"
+        "Use the memories above to answer if they are relevant. If not, ignore them."
+    )
+
+async def retrieve_memories(state: AgentState):
+    """
+    The Recall Node: Gate -> Retrieve (Hybrid Search) -> Similarity Cutoff
+    Skips the embedding call entirely when the message cannot benefit from memory.
+    """
+    # Memories already retrieved by the caller (e.g. shared across a fan-out)
+    if state.get("memories") is not None:
+        return {}
+
+    last_user_msg = state["messages"][-1].content
+
+    if not should_retrieve(last_user_msg):
+        record_skip()
+        return {"memories": []}
+
+    # Checks current chat first, then checks other chats if needed.
+    # Embedding call + Chroma queries block, so they run off the event loop
+    memories, dropped = await asyncio.to_thread(
+        search_memories, state["user_id"], last_user_msg, state["chat_id"]
+    )
+    record_retrieval(memories, dropped)
+    return {"memories": memories}
+
 async def call_gemini(state: AgentState):
     """
-    The Brain Node: Retrieves Memory -> Thinks -> Replies -> Saves Memory
+    The Brain Node: Thinks (with retrieved memories) -> Replies -> Saves Memory
     """
     user_id = state["user_id"]
     chat_id = state["chat_id"]
@@ -40,43 +84,31 @@ async def call_gemini(state: AgentState):
     # We grab the last message (the one the user just sent)
     last_user_msg = state["messages"][-1].content
     
-    # 2. RETRIEVE MEMORY (Hybrid Search)
-    # Checks current chat first, then checks other chats if needed.
-    past_memories = retrieve_memory(user_id, last_user_msg, chat_id)
-    
-    # Format the memories into a text block for the AI
-    memory_text = ""
-    if past_memories:
-        memory_text = "\nRELEVANT MEMORIES FROM PAST:\n" + "\n".join([f"- {m}" for m in past_memories])
-
-    # 3. AUGMENT THE SYSTEM PROMPT
-    # We inject the retrieved memories into the instructions
-    final_system_prompt = (
-        f"{state['system_instruction']}\n"
-        f"----------------\n"
-        f"{memory_text}\n"
-        f"----------------\n"
-        "Use the memories above to answer if they are relevant. If not, ignore them."
-    )
+    # 2. AUGMENT THE SYSTEM PROMPT
+    # We inject the memories found by the retrieve node into the instructions
+    final_system_prompt = build_system_prompt(state["system_instruction"], state.get("memories") or [])
     
-    # 4. CALL AI
+    # 3. CALL AI
     # We replace the static system prompt with our dynamic, memory-filled one
     # Note: We reconstruct the prompt list: [System Message] + [Conversation History]
     prompt_messages = [SystemMessage(content=final_system_prompt)] + state["messages"]
     
     response = await llm.ainvoke(prompt_messages)
     
-    # 5. SAVE MEMORY (Fire and Forget)
+    # 4. SAVE MEMORY (Fire and Forget)
     # We save what the user said so we remember it next time
-    save_memory(user_id, chat_id, last_user_msg)
+    if state.get("persist_memory", True):
+        await asyncio.to_thread(save_memory, user_id, chat_id, last_user_msg)
     
     return {"messages": [response]}
 
 # --- 4. BUILD GRAPH ---
 workflow = StateGraph(AgentState)
 
+workflow.add_node("retrieve", retrieve_memories)
 workflow.add_node("agent", call_gemini)
-workflow.set_entry_point("agent")
+workflow.set_entry_point("retrieve")
+workflow.add_edge("retrieve", "agent")
 workflow.add_edge("agent", END)
 
 app_graph = workflow.compile()
\ No newline at end of file
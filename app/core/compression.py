@@ -0,0 +1,87 @@
+# app/core/compression.py
+import gzip
+from starlette.datastructures import Headers, MutableHeaders
+
+# Brotli is optional: without it, clients asking for "br" get gzip instead.
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+def choose_encoding(accept_encoding: str):
+    """Picks "br" or "gzip" from an Accept-Encoding header (respecting q=0), or None."""
+    accepted = {}
+    for part in accept_encoding.lower().split(","):
+        token, _, params = part.strip().partition(";")
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        accepted[token.strip()] = q
+
+    if brotli and accepted.get("br", 0) > 0:
+        return "br"
+    if accepted.get("gzip", 0) > 0:
+        return "gzip"
+    return None
+
+class CompressionMiddleware:
+    """
+    Compresses buffered responses above minimum_size with brotli or gzip,
+    whichever the client accepts. Streaming responses (export, fan-out) are passed
+    through untouched so each chunk still reaches the client as soon as it is produced.
+    """
+
+    def __init__(self, app, minimum_size: int = 1024, gzip_level: int = 6, brotli_quality: int = 4):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+
+    def compress(self, body: bytes, encoding: str) -> bytes:
+        if encoding == "br":
+            return brotli.compress(body, quality=self.brotli_quality)
+        return gzip.compress(body, compresslevel=self.gzip_level)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        encoding = choose_encoding(Headers(scope=scope).get("accept-encoding", ""))
+        if not encoding:
+            await self.app(scope, receive, send)
+            return
+
+        start_message = None
+        started = False
+
+        async def send_wrapper(message):
+            nonlocal start_message, started
+            if message["type"] == "http.response.start":
+                # Hold the headers back until we know the body size
+                start_message = message
+                return
+            if started or message["type"] != "http.response.body":
+                await send(message)
+                return
+
+            started = True
+            body = message.get("body", b"")
+            headers = MutableHeaders(raw=start_message["headers"])
+            if message.get("more_body", False) or len(body) < self.minimum_size or "content-encoding" in headers:
+                await send(start_message)
+                await send(message)
+                return
+
+            body = self.compress(body, encoding)
+            headers["Content-Encoding"] = encoding
+            headers["Content-Length"] = str(len(body))
+            headers.add_vary_header("Accept-Encoding")
+            await send(start_message)
+            await send({"type": "http.response.body", "body": body})
+
+        await self.app(scope, receive, send_wrapper)
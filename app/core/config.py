@@ -10,4 +10,43 @@ class Settings(BaseSettings):
     ALGORITHM: str = "HS256"
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 10  # <--- SET TO 10 MINUTES
 
-settings = Settings()
\ No newline at end of file
+    # --- Async Connection Pool (Chat / Auth) ---
+    DB_POOL_MIN_SIZE: int = 2               # Opened and warmed at startup
+    DB_POOL_MAX_SIZE: int = 10
+    DB_POOL_TIMEOUT: float = 10.0           # Seconds a request waits for a free connection
+    DB_POOL_MAX_IDLE: float = 300.0         # Idle connections above min_size are closed after this
+    DB_POOL_MAX_LIFETIME: float = 1800.0    # Connections are recycled after this
+    DB_POOL_OPEN_TIMEOUT: float = 30.0      # Startup fails if min_size connections are not ready by then
+    DB_PREPARE_STATEMENTS: bool = True      # Set False behind PgBouncer in transaction mode
+    DB_READY_TIMEOUT: float = 2.0           # Connection wait used by /readyz
+    DB_DDL_LOCK_TIMEOUT_MS: int = 5000      # Startup schema changes fail instead of waiting longer for a table lock
+
+    # --- Read Replica (optional) ---
+    DATABASE_REPLICA_URL: str = os.getenv("DATABASE_REPLICA_URL", "")  # Empty = all reads go to the primary
+    READ_YOUR_WRITES_SECONDS: int = 300     # Lifetime of the write-position cookie; keep above the worst replica lag
+    REPLICA_MAX_LAG_SECONDS: float = 10.0   # Reads go to the primary while the replica is further behind
+    REPLICA_CONNECT_TIMEOUT: float = 1.0    # Wait for a replica connection before falling back to the primary
+    REPLICA_RETRY_SECONDS: float = 5.0      # After a replica failure, reads skip it this long
+
+    # --- Long-Term Memory (ChromaDB) ---
+    CHROMA_PERSIST_DIR: str = os.getenv("CHROMA_PERSIST_DIR", "./chroma_db")
+    MEMORY_MAX_PER_USER: int = 500          # Cap before background eviction kicks in
+    MEMORY_DEDUP_THRESHOLD: float = 0.95    # Cosine similarity above which a text counts as a repeat
+    MEMORY_EVICTION_CHECK_EVERY: int = 20   # Writes per user between cap checks
+    MEMORY_HALF_LIFE_DAYS: float = 30.0     # Recency decay used when ranking memories for eviction
+    MEMORY_RETRIEVAL_MAX_K: int = 5         # Upper bound on memories injected per turn
+    MEMORY_MIN_SIMILARITY: float = 0.55     # Cosine similarity below which a hit is not injected
+
+    # --- Retrieval Gate (app/agent/gate.py) ---
+    RETRIEVAL_GATE_MIN_WORDS: int = 6       # Messages without memory cues need this many words
+    RETRIEVAL_GATE_MODEL_PATH: str = os.getenv("RETRIEVAL_GATE_MODEL_PATH", "")  # Optional joblib classifier
+
+    # --- HTTP Responses ---
+    COMPRESSION_MIN_BYTES: int = 1024       # Smaller bodies are sent uncompressed
+
+    # --- Background Reaper (Deleted Chats / Accounts) ---
+    REAPER_INTERVAL_SECONDS: int = 30       # Pause between sweeps
+    REAPER_BATCH_SIZE: int = 1000           # Messages deleted per statement
+    REAPER_GRACE_SECONDS: int = 120         # Tombstones younger than this are left for in-flight requests
+
+settings = Settings()
@@ -1,9 +1,14 @@
 # app/core/database.py
 import os
+import time
+from contextlib import asynccontextmanager
 from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker, declarative_base
+import psycopg
 from psycopg_pool import AsyncConnectionPool # The modern Async driver
 from dotenv import load_dotenv
+from app.core.config import settings
+from app.core.queries import SELECT_REPLICA_STATUS, SELECT_WAL_LSN, WARMUP_STATEMENTS
 
 load_dotenv()
 
@@ -34,8 +39,116 @@ def get_db():
         db.close()
 
 # --- SYSTEM B: Psycopg Pool (Async) for Chat ---
-# We create the pool object here but OPEN it in main.py
-pool = AsyncConnectionPool(conninfo=DATABASE_URL, open=False)
+async def prepare_hot_statements(conn):
+    """
+    Runs on every new pool connection: prepares the hot chat/auth statements so
+    the first real request on this connection skips parsing and planning.
+    """
+    if not settings.DB_PREPARE_STATEMENTS:
+        return
+    try:
+        for query, params in WARMUP_STATEMENTS:
+            await conn.execute(query, params, prepare=True)
+    except (psycopg.errors.UndefinedTable, psycopg.errors.UndefinedColumn):
+        # Fresh database: init_db has not created the tables yet. The statements
+        # still get prepared on first use (prepare_threshold=0).
+        print("⚠️ Skipping statement warm-up: tables not created yet.")
+    finally:
+        await conn.rollback()
+
+def make_pool(conninfo: str) -> AsyncConnectionPool:
+    """Builds an (unopened) pool with the sizing and timeouts from Settings."""
+    return AsyncConnectionPool(
+        conninfo=conninfo,
+        min_size=settings.DB_POOL_MIN_SIZE,
+        max_size=settings.DB_POOL_MAX_SIZE,
+        timeout=settings.DB_POOL_TIMEOUT,
+        max_idle=settings.DB_POOL_MAX_IDLE,
+        max_lifetime=settings.DB_POOL_MAX_LIFETIME,
+        # prepare_threshold=0 prepares every statement on first use; None disables it
+        kwargs={"prepare_threshold": 0 if settings.DB_PREPARE_STATEMENTS else None},
+        configure=prepare_hot_statements,
+        open=False,
+    )
+
+# We create the pool objects here but OPEN them in main.py
+pool = make_pool(DATABASE_URL)
+
+# Optional read replica for read-only endpoints (None when not configured)
+replica_pool = make_pool(settings.DATABASE_REPLICA_URL) if settings.DATABASE_REPLICA_URL else None
+
+# --- Read-Your-Writes ---
+# After a write the client is handed the primary's WAL position (header and
+# cookie) and sends it back on later requests. A read uses the replica only once
+# the replica has replayed up to that position, so a user never sees it lag
+# behind their own changes, whichever worker served the write.
+WRITE_LSN_HEADER = "X-Write-LSN"
+WRITE_LSN_COOKIE = "write_lsn"
+
+async def mark_write(conn, response):
+    """Call after committing a write: passes the primary's WAL position to the client."""
+    if replica_pool is None:
+        return
+    cur = await conn.execute(SELECT_WAL_LSN)
+    (lsn,) = await cur.fetchone()
+    response.headers[WRITE_LSN_HEADER] = lsn
+    response.set_cookie(
+        WRITE_LSN_COOKIE, lsn,
+        max_age=settings.READ_YOUR_WRITES_SECONDS, httponly=True, samesite="lax"
+    )
+
+# monotonic() time before which reads skip the replica after it failed, so an
+# outage does not cost every read a REPLICA_CONNECT_TIMEOUT wait. Per process.
+_replica_retry_at = 0.0
+
+async def _replica_connection(min_lsn: str = None):
+    """
+    A replica connection that has replayed min_lsn and is within
+    REPLICA_MAX_LAG_SECONDS, or None to use the primary. Never raises for an
+    unreachable or broken replica.
+    """
+    global _replica_retry_at
+    if time.monotonic() < _replica_retry_at:
+        return None
+
+    usable = False
+    try:
+        conn = await replica_pool.getconn(timeout=settings.REPLICA_CONNECT_TIMEOUT)
+    except psycopg.OperationalError:
+        # PoolTimeout / PoolClosed: the replica is down or saturated
+        _replica_retry_at = time.monotonic() + settings.REPLICA_RETRY_SECONDS
+        return None
+    try:
+        cur = await conn.execute(SELECT_REPLICA_STATUS, (min_lsn or "0/0",))
+        replayed, lag = await cur.fetchone()
+        await conn.rollback()
+        usable = replayed and lag <= settings.REPLICA_MAX_LAG_SECONDS
+    except psycopg.Error:
+        # Broken connection: putconn discards it and the pool reconnects
+        _replica_retry_at = time.monotonic() + settings.REPLICA_RETRY_SECONDS
+    finally:
+        if not usable:
+            await replica_pool.putconn(conn)
+    return conn if usable else None
+
+@asynccontextmanager
+async def read_connection(min_lsn: str = None):
+    """
+    Connection for read-only work: the replica when it is configured, reachable,
+    not lagging too far and caught up with min_lsn (the client's last write),
+    otherwise the primary.
+    """
+    conn = await _replica_connection(min_lsn) if replica_pool is not None else None
+    if conn is None:
+        async with pool.connection() as conn:
+            yield conn
+        return
+    # Same commit/rollback handling as pool.connection()
+    try:
+        async with conn:
+            yield conn
+    finally:
+        await replica_pool.putconn(conn)
 
 async def get_db_connection():
     """
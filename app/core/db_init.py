@@ -1,5 +1,6 @@
 # app/core/db_init.py
 from psycopg_pool import AsyncConnectionPool
+from app.core.config import settings
 
 async def init_db(pool: AsyncConnectionPool):
     """
@@ -20,7 +21,7 @@ async def init_db(pool: AsyncConnectionPool):
                 user_id UUID PRIMARY KEY DEFAULT uuid_generate_v4(),
                 email VARCHAR(255) UNIQUE NOT NULL,
                 username VARCHAR(100) NOT NULL,
-                password_hash VARCHAR(255) NOT NULL,
+                hashed_password VARCHAR(255) NOT NULL,
                 created_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
                 is_active BOOLEAN DEFAULT TRUE
             );
@@ -43,14 +44,41 @@ async def init_db(pool: AsyncConnectionPool):
             # 4. Messages Table
             await cur.execute("""
             CREATE TABLE IF NOT EXISTS messages (
-                message_id UUID PRIMARY KEY DEFAULT uuid_generate_v4(),
+                id UUID PRIMARY KEY DEFAULT uuid_generate_v4(),
                 chat_id UUID NOT NULL REFERENCES chats(chat_id) ON DELETE CASCADE,
                 role VARCHAR(20) NOT NULL, 
                 content TEXT NOT NULL,
                 created_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP
             );
             """)
-            await cur.execute("CREATE INDEX IF NOT EXISTS idx_messages_chat_time ON messages(chat_id, created_at DESC);")
+
+            # This runs on every worker start. ALTER TABLE and CREATE INDEX lock the
+            # table even when there is nothing to do, queueing behind long
+            # transactions (exports, the reaper) and blocking all traffic behind
+            # them, so only the missing pieces are run, with a short lock_timeout
+            # (a restart retries).
+            await cur.execute("""
+            SELECT table_name FROM information_schema.columns
+            WHERE table_schema = current_schema()
+              AND table_name IN ('users', 'chats')
+              AND column_name = 'deleted_at'
+            """)
+            has_deleted_at = {row[0] for row in await cur.fetchall()}
+            await cur.execute(
+                "SELECT to_regclass('idx_messages_chat_time') IS NOT NULL, to_regclass('idx_chats_tombstoned') IS NOT NULL"
+            )
+            has_history_index, has_tombstone_index = await cur.fetchone()
+            await cur.execute("SELECT set_config('lock_timeout', %s, true)", (f"{settings.DB_DDL_LOCK_TIMEOUT_MS}ms",))
+
+            if not has_history_index:
+                await cur.execute("CREATE INDEX IF NOT EXISTS idx_messages_chat_time ON messages(chat_id, created_at DESC);")
+
+            # 5. Tombstones for asynchronous deletion (see app/core/reaper.py)
+            for table in ("users", "chats"):
+                if table not in has_deleted_at:
+                    await cur.execute(f"ALTER TABLE {table} ADD COLUMN IF NOT EXISTS deleted_at TIMESTAMP WITH TIME ZONE;")
+            if not has_tombstone_index:
+                await cur.execute("CREATE INDEX IF NOT EXISTS idx_chats_tombstoned ON chats(deleted_at) WHERE deleted_at IS NOT NULL;")
 
             # --- TEMPORARILY DISABLED MEMORY TABLE ---
             # Because 'vector(1536)' type doesn't exist on your PC yet.
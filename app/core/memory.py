@@ -1,15 +1,21 @@
 # app/core/memory.py
+import math
 import os
+import re
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
 from langchain_chroma import Chroma
 from langchain_google_genai import GoogleGenerativeAIEmbeddings
-from langchain_core.documents import Document
 from dotenv import load_dotenv
+from app.core.config import settings
 
 load_dotenv()
 
 # 1. Setup Embeddings
 embeddings = GoogleGenerativeAIEmbeddings(
-    model="models/text-embedding-004", 
+    model="models/text-embedding-004",
     google_api_key=os.getenv("GOOGLE_API_KEY")
 )
 
@@ -17,21 +23,295 @@ embeddings = GoogleGenerativeAIEmbeddings(
 vector_store = Chroma(
     collection_name="chat_memory",
     embedding_function=embeddings,
-    persist_directory="./chroma_db" 
+    persist_directory=settings.CHROMA_PERSIST_DIR
 )
 
+# 3. Write Policy
+# Messages that carry no information worth remembering.
+TRIVIAL_MESSAGES = {
+    "hi", "hii", "hello", "hey", "yo", "ok", "okay", "k", "kk", "yes", "no", "yeah", "nope",
+    "thanks", "thank you", "thx", "ty", "bye", "good night", "good morning", "gn", "gm",
+    "lol", "lmao", "haha", "hmm", "cool", "nice", "sure", "great", "fine",
+}
+PERSONAL_CUES = re.compile(r"\b(i|i'm|im|my|me|mine|we|our|i've|i'll)\b")
+IMPORTANT_CUES = re.compile(r"\b(remember|don't forget|dont forget|always|never|favorite|favourite|allergic|birthday)\b")
+
+# Eviction runs on a single background thread so writes never wait on it.
+_eviction_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="memory-eviction")
+_writes_since_check: dict[str, int] = {}
+_eviction_pending: set[str] = set()
+
+# Chats deleted in this process, or seen by its last reaper sweep (user_id -> chat_ids).
+# Covers the moment between the tombstone and the purge the delete endpoints schedule.
+_tombstoned_chats: dict[str, set[str]] = {}
+
+# text-embedding-004 embeds queries and documents with different task types.
+# Stored vectors are always documents (as in save_memories_bulk); only search
+# uses query vectors, so similarity thresholds mean the same for every memory.
+@lru_cache(maxsize=256)
+def _embed_query(text: str) -> tuple:
+    """Embeds a search query once; repeated questions skip the API round trip."""
+    return tuple(embeddings.embed_query(text))
+
+def _embed_document(text: str) -> list:
+    """Embeds a text to be stored (or compared against stored memories)."""
+    return embeddings.embed_documents([text])[0]
+
+def _similarity(distance: float) -> float:
+    """
+    Converts Chroma's default squared-L2 distance into cosine similarity.
+    Valid because text-embedding-004 vectors are unit length.
+    """
+    return 1.0 - distance / 2.0
+
+def is_trivial(text: str) -> bool:
+    """Greetings, acknowledgements and single words are not worth a vector."""
+    normalized = re.sub(r"[^\w\s']", "", text.lower()).strip()
+    if not normalized:
+        return True
+    if normalized in TRIVIAL_MESSAGES:
+        return True
+    return len(normalized.split()) < 2
+
+def score_salience(text: str) -> float:
+    """
+    Cheap 0..1 estimate of how useful a memory will be later.
+    Longer, personal and explicitly important statements score higher.
+    """
+    lowered = text.lower()
+    score = 0.3
+    score += min(len(lowered.split()) / 40, 0.3)
+    if PERSONAL_CUES.search(lowered):
+        score += 0.2
+    if IMPORTANT_CUES.search(lowered):
+        score += 0.1
+    if any(ch.isdigit() for ch in lowered):
+        score += 0.1
+    return min(score, 1.0)
+
+def _memory_value(metadata: dict, now: float) -> float:
+    """Ranking used for eviction: salience boosted by hits, decayed by time since last hit."""
+    salience = metadata.get("salience", 0.5)
+    hits = metadata.get("hits", 0)
+    # Memories written before the policy existed have no timestamps and go first.
+    last_hit_at = metadata.get("last_hit_at") or metadata.get("created_at") or 0
+    age_days = max(now - last_hit_at, 0) / 86400
+    decay = 0.5 ** (age_days / settings.MEMORY_HALF_LIFE_DAYS)
+    return (salience + 0.1 * math.log1p(hits)) * decay
+
+def _touch(ids: list, metadatas: list, salience_boost: float = 0.0):
+    """Records a hit on existing memories (last_hit_at, hits, optional salience bump)."""
+    now = time.time()
+    updated = []
+    for meta in metadatas:
+        meta = dict(meta or {})
+        meta["last_hit_at"] = now
+        meta["hits"] = meta.get("hits", 0) + 1
+        meta["salience"] = min(meta.get("salience", 0.5) + salience_boost, 1.0)
+        updated.append(meta)
+    vector_store._collection.update(ids=ids, metadatas=updated)
+
+def _evict_user_memories(user_id: str):
+    """Deletes the least valuable memories of a user until they are back under the cap."""
+    try:
+        stored = vector_store._collection.get(where={"user_id": user_id}, include=["metadatas"])
+        overflow = len(stored["ids"]) - settings.MEMORY_MAX_PER_USER
+        if overflow <= 0:
+            return
+
+        now = time.time()
+        ranked = sorted(
+            zip(stored["ids"], stored["metadatas"]),
+            key=lambda item: _memory_value(item[1] or {}, now)
+        )
+        vector_store._collection.delete(ids=[memory_id for memory_id, _ in ranked[:overflow]])
+        print(f"🧹 Evicted {overflow} memories for user {user_id}")
+    except Exception as e:
+        print(f"Memory Eviction Error: {e}")
+    finally:
+        _eviction_pending.discard(user_id)
+
+def _request_eviction(user_id: str):
+    """Queues a cap check for a user unless one is already waiting."""
+    if user_id in _eviction_pending:
+        return
+    _eviction_pending.add(user_id)
+    _eviction_executor.submit(_evict_user_memories, user_id)
+
+def _schedule_eviction(user_id: str):
+    """Checks the per-user cap every few writes, in the background."""
+    count = _writes_since_check.get(user_id, 0) + 1
+    if count < settings.MEMORY_EVICTION_CHECK_EVERY:
+        _writes_since_check[user_id] = count
+        return
+    _writes_since_check[user_id] = 0
+    _request_eviction(user_id)
+
 def save_memory(user_id: str, chat_id: str, text: str):
-    """Saves user input into the vector DB."""
-    doc = Document(
-        page_content=text,
-        metadata={"user_id": user_id, "chat_id": chat_id}
+    """
+    Saves user input into the vector DB, following the write policy:
+    1. Trivial messages (greetings, "ok") are skipped.
+    2. Near-duplicates of a memory in the same chat reinforce it instead of adding a new one.
+    3. New memories get a salience score and timestamps used for eviction.
+    Returns the memory id that was written or reinforced, or None if skipped.
+    """
+    text = text.strip()
+    if is_trivial(text):
+        return None
+    # Chat deleted while the request was in flight: the reaper may already be done with it
+    if str(chat_id) in _tombstoned_chats.get(user_id, ()):
+        return None
+
+    embedding = _embed_document(text)
+
+    # Near-duplicate check against the closest memory of the same chat.
+    # A repeat in another chat is stored again, so the current-chat-first lookup
+    # finds it and deleting the other chat does not take the fact with it.
+    nearest = vector_store._collection.query(
+        query_embeddings=[embedding],
+        n_results=1,
+        where={
+            "$and": [
+                {"user_id": user_id},
+                {"chat_id": chat_id}
+            ]
+        },
+        include=["metadatas", "distances"]
+    )
+    if nearest["ids"] and nearest["ids"][0]:
+        best_id = nearest["ids"][0][0]
+        if _similarity(nearest["distances"][0][0]) >= settings.MEMORY_DEDUP_THRESHOLD:
+            _touch([best_id], [nearest["metadatas"][0][0]], salience_boost=0.05)
+            return best_id
+
+    now = time.time()
+    memory_id = str(uuid.uuid4())
+    vector_store._collection.add(
+        ids=[memory_id],
+        embeddings=[embedding],
+        documents=[text],
+        metadatas=[{
+            "user_id": user_id,
+            "chat_id": chat_id,
+            "salience": score_salience(text),
+            "hits": 0,
+            "created_at": now,
+            "last_hit_at": now,
+        }]
     )
-    vector_store.add_documents([doc])
+    _schedule_eviction(user_id)
+    return memory_id
 
-def retrieve_memory(user_id: str, query: str, current_chat_id: str, k: int = 3):
+def memory_budget(user_id: str) -> int:
+    """How many more memories the user can hold before eviction kicks in."""
+    stored = vector_store._collection.get(where={"user_id": user_id}, include=[])
+    return max(settings.MEMORY_MAX_PER_USER - len(stored["ids"]), 0)
+
+def save_memories_bulk(user_id: str, items: list, limit: int = None, batch_size: int = 100):
+    """
+    Bulk version of save_memory, used when importing chat history.
+    items: list of (chat_id, text). Trivial texts and exact repeats are skipped,
+    then only the `limit` most salient texts (default: the user's remaining
+    budget) are embedded, in batches. Anything beyond the cap would just be
+    evicted again, so embedding it is wasted API calls.
+    The per-text near-duplicate query is not run.
+    Returns how many memories were written.
+    """
+    if limit is None:
+        limit = memory_budget(user_id)
+    if limit <= 0:
+        return 0
+
+    seen = set()
+    candidates = []
+    for chat_id, text in items:
+        text = text.strip()
+        if is_trivial(text) or text in seen:
+            continue
+        seen.add(text)
+        candidates.append((score_salience(text), chat_id, text))
+
+    candidates.sort(key=lambda item: item[0], reverse=True)
+    candidates = candidates[:limit]
+
+    now = time.time()
+    for start in range(0, len(candidates), batch_size):
+        batch = candidates[start:start + batch_size]
+        vector_store._collection.add(
+            ids=[str(uuid.uuid4()) for _ in batch],
+            embeddings=embeddings.embed_documents([text for _, _, text in batch]),
+            documents=[text for _, _, text in batch],
+            metadatas=[{
+                "user_id": user_id,
+                "chat_id": chat_id,
+                "salience": salience,
+                "hits": 0,
+                "created_at": now,
+                "last_hit_at": now,
+            } for salience, chat_id, text in batch]
+        )
+
+    if candidates:
+        _request_eviction(user_id)
+    return len(candidates)
+
+def mark_chats_tombstoned(user_id: str, chat_ids: list):
+    """Hides a deleted chat's memories from retrieval until the reaper purges them."""
+    _tombstoned_chats.setdefault(user_id, set()).update(str(chat_id) for chat_id in chat_ids)
+
+def set_tombstoned_chats(rows: list):
+    """Replaces the tombstone list with the reaper's view of the DB: [(chat_id, user_id), ...]."""
+    fresh: dict[str, set[str]] = {}
+    for chat_id, user_id in rows:
+        fresh.setdefault(str(user_id), set()).add(str(chat_id))
+    _tombstoned_chats.clear()
+    _tombstoned_chats.update(fresh)
+
+def purge_chat_memories(chat_id: str):
+    """Deletes every vector that belongs to a chat."""
+    vector_store._collection.delete(where={"chat_id": str(chat_id)})
+
+def purge_user_memories(user_id: str):
+    """Deletes every vector that belongs to a user."""
+    vector_store._collection.delete(where={"user_id": str(user_id)})
+    _tombstoned_chats.pop(str(user_id), None)
+
+def _query_memories(embedding: list, where: dict, k: int, min_similarity: float):
+    """
+    Runs a vector query and splits the hits by the similarity cutoff.
+    Returns (kept, dropped): kept is [(id, document, metadata)], dropped is [document].
+    """
+    results = vector_store._collection.query(
+        query_embeddings=[embedding],
+        n_results=k,
+        where=where,
+        include=["documents", "metadatas", "distances"]
+    )
+    kept, dropped = [], []
+    if not results["ids"]:
+        return kept, dropped
+    for memory_id, doc, meta, distance in zip(
+        results["ids"][0], results["documents"][0], results["metadatas"][0], results["distances"][0]
+    ):
+        if _similarity(distance) >= min_similarity:
+            kept.append((memory_id, doc, meta))
+        else:
+            dropped.append(doc)
+    return kept, dropped
+
+def search_memories(user_id: str, query: str, current_chat_id: str, k: int = None, min_similarity: float = None):
     """
     Hybrid Search Strategy with FIXED Syntax.
+    Only hits above the similarity cutoff are kept (k is just an upper bound), so
+    an irrelevant query injects nothing instead of the k least-bad matches.
+    Returns (memories, dropped) where dropped are the hits below the cutoff.
+    Hits are recorded in the background so eviction keeps memories that get used.
     """
+    k = k or settings.MEMORY_RETRIEVAL_MAX_K
+    if min_similarity is None:
+        min_similarity = settings.MEMORY_MIN_SIMILARITY
+    embedding = list(_embed_query(query))
+
     # Attempt 1: Strict Local Search (Current Chat Only)
     # FIX: We use "$and" because we are filtering by TWO fields (user_id AND chat_id)
     local_filter = {
@@ -40,23 +320,27 @@ def retrieve_memory(user_id: str, query: str, current_chat_id: str, k: int = 3):
             {"chat_id": current_chat_id}
         ]
     }
-    
-    local_results = vector_store.similarity_search(
-        query, 
-        k=k, 
-        filter=local_filter # <--- Passing the fixed filter
-    )
-    
+
+    kept, dropped = _query_memories(embedding, local_filter, k, min_similarity)
+
     # If we found good matches locally, return them
-    if local_results:
-        return [doc.page_content for doc in local_results]
-        
+    if kept:
+        _eviction_executor.submit(_touch, [m[0] for m in kept], [m[2] for m in kept])
+        return [m[1] for m in kept], dropped
+
     # Attempt 2: Global Search (Backup)
-    # This filter is fine because it only has ONE field
-    global_results = vector_store.similarity_search(
-        query, 
-        k=k, 
-        filter={"user_id": user_id}
-    )
-    
-    return [f"{doc.page_content} (from another chat)" for doc in global_results]
\ No newline at end of file
+    # Deleted chats are excluded until their vectors are purged
+    global_filter = {"user_id": user_id}
+    tombstoned = _tombstoned_chats.get(user_id)
+    if tombstoned:
+        global_filter = {
+            "$and": [
+                {"user_id": user_id},
+                {"chat_id": {"$nin": list(tombstoned)}}
+            ]
+        }
+    kept, global_dropped = _query_memories(embedding, global_filter, k, min_similarity)
+    if kept:
+        _eviction_executor.submit(_touch, [m[0] for m in kept], [m[2] for m in kept])
+
+    return [f"{m[1]} (from another chat)" for m in kept], dropped + global_dropped
@@ -0,0 +1,80 @@
+# app/core/queries.py
+# Hot-path SQL shared by the routers and the pool warm-up in database.py.
+# psycopg caches prepared statements by query text, so the routers must use
+# these exact strings for the warm-up to pay off.
+
+# --- Chat ---
+SELECT_CHAT_PROMPT = "SELECT system_prompt FROM chats WHERE chat_id = %s AND user_id = %s AND deleted_at IS NULL"
+
+SELECT_CHAT_INFO = "SELECT chat_name, personality_type FROM chats WHERE chat_id = %s AND user_id = %s AND deleted_at IS NULL"
+
+SELECT_USER_CHATS = """
+SELECT chat_id, chat_name, personality_type, created_at
+FROM chats
+WHERE user_id = %s AND deleted_at IS NULL
+ORDER BY created_at DESC
+"""
+
+SELECT_CHAT_HISTORY = """
+SELECT role, content FROM messages
+WHERE chat_id = %s
+ORDER BY created_at DESC
+LIMIT %s
+"""
+
+SELECT_CHAT_MESSAGES = """
+SELECT role, content, created_at
+FROM messages
+WHERE chat_id = %s
+ORDER BY created_at ASC
+"""
+
+# Only inserts while the chat is not tombstoned. FOR SHARE makes a concurrent
+# delete wait for this insert, so the reaper always sees the row.
+INSERT_MESSAGE = """
+INSERT INTO messages (id, chat_id, role, content)
+SELECT %s, chat_id, %s, %s
+FROM chats
+WHERE chat_id = %s AND deleted_at IS NULL
+FOR SHARE
+"""
+
+# --- Auth ---
+SELECT_LOGIN_USER = """
+SELECT user_id, hashed_password
+FROM users
+WHERE email = %s OR username = %s
+"""
+
+# Runs on every authenticated request (get_current_user in deps.py)
+SELECT_CURRENT_USER = "SELECT user_id, username, email, is_active FROM users WHERE user_id = %s"
+
+# --- Read-Your-Writes (database.py) ---
+# Primary only: recovery mode rejects it, so it is not part of the warm-up
+SELECT_WAL_LSN = "SELECT pg_current_wal_lsn()::text"
+
+# On the replica: has it replayed the given WAL position (true when not replaying
+# at all), and how many seconds is it behind. Lag counts as 0 once everything
+# received is replayed, so an idle primary does not look like a lagging replica.
+SELECT_REPLICA_STATUS = """
+SELECT
+    COALESCE(pg_last_wal_replay_lsn() >= %s::pg_lsn, true),
+    CASE
+        WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+        ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0)
+    END::float8
+"""
+
+# Statements prepared on every new pool connection, with harmless dummy
+# parameters of the same Python types the routers pass (str ids, int limit).
+NIL_UUID = "00000000-0000-0000-0000-000000000000"
+WARMUP_STATEMENTS = [
+    (SELECT_CHAT_PROMPT, (NIL_UUID, NIL_UUID)),
+    (SELECT_CHAT_INFO, (NIL_UUID, NIL_UUID)),
+    (SELECT_USER_CHATS, (NIL_UUID,)),
+    (SELECT_CHAT_HISTORY, (NIL_UUID, 10)),
+    (SELECT_CHAT_MESSAGES, (NIL_UUID,)),
+    (SELECT_LOGIN_USER, ("", "")),
+    (SELECT_CURRENT_USER, (NIL_UUID,)),
+    (SELECT_REPLICA_STATUS, ("0/0",)),
+]
@@ -0,0 +1,140 @@
+# app/core/reaper.py
+import asyncio
+from app.core.config import settings
+from app.core.database import pool
+from app.core.memory import (
+    mark_chats_tombstoned,
+    set_tombstoned_chats,
+    purge_chat_memories,
+    purge_user_memories,
+)
+
+# Deleting a chat only stamps deleted_at. The name gets a unique suffix so the
+# user can reuse it right away despite UNIQUE(user_id, chat_name).
+TOMBSTONE_CHATS_SQL = """
+UPDATE chats
+SET deleted_at = now(),
+    chat_name = left(chat_name, 50) || ' [deleted ' || chat_id::text || ']'
+WHERE user_id = %s AND deleted_at IS NULL
+"""
+
+async def tombstone_chats(conn, user_id: str, chat_id: str = None) -> list:
+    """
+    Marks one chat (or all of a user's chats) as deleted and hides their memories.
+    The caller commits. Returns the ids that were tombstoned.
+    """
+    query = TOMBSTONE_CHATS_SQL
+    params = [user_id]
+    if chat_id:
+        query += " AND chat_id = %s"
+        params.append(chat_id)
+
+    async with conn.cursor() as cur:
+        await cur.execute(query + " RETURNING chat_id", params)
+        chat_ids = [str(row[0]) for row in await cur.fetchall()]
+
+    mark_chats_tombstoned(user_id, chat_ids)
+    return chat_ids
+
+# Key of the session-level advisory lock that makes the sweep single-flight
+# across all worker processes.
+REAPER_LOCK_ID = 726001
+
+async def reap_chat(conn, chat_id):
+    """Deletes a tombstoned chat: messages in bounded batches, then vectors, then the row."""
+    # Loop until nothing is left, so the final DELETE FROM chats never cascades
+    # an unbounded number of messages
+    while True:
+        async with conn.cursor() as cur:
+            await cur.execute(
+                """
+                DELETE FROM messages
+                WHERE id IN (SELECT id FROM messages WHERE chat_id = %s LIMIT %s)
+                """,
+                (chat_id, settings.REAPER_BATCH_SIZE)
+            )
+            deleted = cur.rowcount
+        # Commit per batch so locks and WAL stay small and other writers get through
+        await conn.commit()
+        if deleted == 0:
+            break
+
+    # Vectors go before the row: if we crash here, the tombstone is still there to retry
+    await asyncio.to_thread(purge_chat_memories, chat_id)
+
+    async with conn.cursor() as cur:
+        await cur.execute("DELETE FROM chats WHERE chat_id = %s AND deleted_at IS NOT NULL", (chat_id,))
+    await conn.commit()
+
+async def reap_once():
+    """
+    One sweep: reap every tombstoned chat, then every deleted user with no chats left.
+    Every worker refreshes its retrieval filter, but only the one holding the
+    advisory lock deletes. Tombstones younger than REAPER_GRACE_SECONDS are left
+    alone so a /chat/send still waiting on Gemini finishes first.
+    """
+    async with pool.connection() as conn:
+        async with conn.cursor() as cur:
+            await cur.execute("SELECT chat_id, user_id FROM chats WHERE deleted_at IS NOT NULL")
+            all_tombstoned = await cur.fetchall()
+        await conn.commit()
+
+        # Keeps retrieval filtering in sync with tombstones written by other workers
+        set_tombstoned_chats(all_tombstoned)
+
+        async with conn.cursor() as cur:
+            await cur.execute("SELECT pg_try_advisory_lock(%s)", (REAPER_LOCK_ID,))
+            locked = (await cur.fetchone())[0]
+        await conn.commit()
+        if not locked:
+            return
+
+        try:
+            async with conn.cursor() as cur:
+                await cur.execute(
+                    """
+                    SELECT chat_id FROM chats
+                    WHERE deleted_at IS NOT NULL
+                      AND deleted_at < now() - make_interval(secs => %s)
+                    """,
+                    (settings.REAPER_GRACE_SECONDS,)
+                )
+                tombstoned = [row[0] for row in await cur.fetchall()]
+            await conn.commit()
+
+            for chat_id in tombstoned:
+                await reap_chat(conn, chat_id)
+
+            async with conn.cursor() as cur:
+                await cur.execute(
+                    """
+                    SELECT user_id FROM users u
+                    WHERE u.deleted_at IS NOT NULL
+                      AND NOT EXISTS (SELECT 1 FROM chats c WHERE c.user_id = u.user_id)
+                    """
+                )
+                deleted_users = [row[0] for row in await cur.fetchall()]
+            await conn.commit()
+
+            for user_id in deleted_users:
+                await asyncio.to_thread(purge_user_memories, str(user_id))
+                async with conn.cursor() as cur:
+                    await cur.execute("DELETE FROM users WHERE user_id = %s AND deleted_at IS NOT NULL", (user_id,))
+                await conn.commit()
+        finally:
+            # The lock is per session: release it before the connection goes back to the pool
+            await conn.rollback()
+            await conn.execute("SELECT pg_advisory_unlock(%s)", (REAPER_LOCK_ID,))
+            await conn.commit()
+
+    if tombstoned or deleted_users:
+        print(f"🧹 Reaper removed {len(tombstoned)} chats and {len(deleted_users)} accounts")
+
+async def run_reaper():
+    """Background loop started in main.py's lifespan."""
+    while True:
+        try:
+            await reap_once()
+        except Exception as e:
+            print(f"Reaper Error: {e}")
+        await asyncio.sleep(settings.REAPER_INTERVAL_SECONDS)
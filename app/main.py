@@ -1,10 +1,19 @@
 # app/main.py
-from contextlib import asynccontextmanager
+import asyncio
+from contextlib import asynccontextmanager, suppress
 from fastapi import FastAPI
+from fastapi.responses import JSONResponse
 from fastapi.middleware.cors import CORSMiddleware
 
 # Import the pool we created in database.py
-from app.core.database import pool 
+from app.core.database import WRITE_LSN_HEADER, pool, replica_pool
+from app.core.queries import SELECT_REPLICA_STATUS
+from app.core.db_init import init_db
+from app.core.reaper import run_reaper
+
+from app.core.config import settings
+from app.core.compression import CompressionMiddleware
+from app.agent.gate import get_retrieval_stats
 
 # Import Routers
 from app.routers import auth, chat
@@ -14,10 +23,24 @@ from app.routers import auth, chat
 async def lifespan(app: FastAPI):
     # 1. Startup: Open the Database Pool
     print("🚀 Starting up: Connecting to Database...")
-    await pool.open()
+    # wait=True prewarms: startup blocks until min_size connections are open and prepared
+    await pool.open(wait=True, timeout=settings.DB_POOL_OPEN_TIMEOUT)
+    await init_db(pool)
+    if replica_pool is not None:
+        print("🚀 Connecting to read replica...")
+        # No wait: a replica that is down must not block startup. Reads use the
+        # primary until its connections are up.
+        await replica_pool.open(wait=False)
+    # 2. Background reaper for deleted chats/accounts
+    reaper_task = asyncio.create_task(run_reaper())
     yield
-    # 2. Shutdown: Close the Database Pool
+    # 3. Shutdown: Stop the reaper, close the Database Pool
     print("🛑 Shutting down: Closing Database connection...")
+    reaper_task.cancel()
+    with suppress(asyncio.CancelledError):
+        await reaper_task
+    if replica_pool is not None:
+        await replica_pool.close()
     await pool.close()
 
 # --- APP SETUP ---
@@ -33,12 +56,81 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    # Cross-origin JS can only read listed headers; the frontend sends this one
+    # back so reads stay consistent with its own writes (read-your-writes)
+    expose_headers=[WRITE_LSN_HEADER],
 )
 
+# Compression (gzip / brotli, negotiated) for large JSON payloads like chat histories
+app.add_middleware(CompressionMiddleware, minimum_size=settings.COMPRESSION_MIN_BYTES)
+
 # --- INCLUDE ROUTERS ---
 app.include_router(auth.router)
 app.include_router(chat.router)
 
 @app.get("/")
 def root():
-    return {"message": "AI Agent Backend is Running 🚀"}
\ No newline at end of file
+    return {"message": "AI Agent Backend is Running 🚀"}
+
+@app.get("/stats")
+def stats():
+    """Per-worker counters: retrieval gate skip rate and estimated prompt tokens saved."""
+    return {"retrieval": get_retrieval_stats()}
+
+# --- HEALTH CHECKS (for load balancers) ---
+@app.get("/healthz")
+def healthz():
+    """Liveness: the process is up and serving requests."""
+    return {"status": "ok"}
+
+def pool_status(p) -> dict:
+    """Size, usage and queue length of a connection pool."""
+    stats = p.get_stats()
+    in_use = stats.get("pool_size", 0) - stats.get("pool_available", 0)
+    return {
+        "size": stats.get("pool_size", 0),
+        "available": stats.get("pool_available", 0),
+        "in_use": in_use,
+        "max": p.max_size,
+        "waiting": stats.get("requests_waiting", 0),
+        "saturation": round(in_use / p.max_size, 3),
+    }
+
+async def check_pool(p, query: str = "SELECT 1", params=None):
+    """Returns (status, pool info, result row of query) for one pool."""
+    info = pool_status(p)
+    if info["waiting"] > 0 and info["size"] >= p.max_size:
+        return "saturated", info, None
+    try:
+        async with p.connection(timeout=settings.DB_READY_TIMEOUT) as conn:
+            cur = await conn.execute(query, params)
+            row = await cur.fetchone()
+    except Exception as e:
+        info["error"] = str(e)
+        return "unavailable", info, None
+    return "ready", info, row
+
+@app.get("/readyz")
+async def readyz():
+    """
+    Readiness: the primary pool can hand out a connection and its DB answers.
+    Returns 503 when every connection is busy and requests are queueing, so the
+    load balancer sends traffic to another worker instead.
+    The replica's status and lag are reported but never fail the probe: while it
+    is down or lagging, reads fall back to the primary.
+    """
+    status, pool_info, _ = await check_pool(pool)
+    body = {"status": status, "pool": pool_info}
+
+    if replica_pool is not None:
+        replica_status, replica_info, row = await check_pool(replica_pool, SELECT_REPLICA_STATUS, ("0/0",))
+        lag = row[1] if row else None
+        if lag is not None and lag > settings.REPLICA_MAX_LAG_SECONDS:
+            replica_status = "lagging"
+        replica_info["status"] = replica_status
+        replica_info["lag_seconds"] = lag
+        body["replica"] = replica_info
+
+    if status != "ready":
+        return JSONResponse(status_code=503, content=body)
+    return body
\ No newline at end of file
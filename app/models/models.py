@@ -16,6 +16,7 @@ class User(Base):
     hashed_password = Column(String, nullable=False)
     is_active = Column(Boolean, default=True)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
+    deleted_at = Column(DateTime(timezone=True), nullable=True) # Set on account deletion, reaped later
 
     # Relationship: One User has many Chats
     chats = relationship("Chat", back_populates="owner")
@@ -30,6 +31,7 @@ class Chat(Base):
     personality_type = Column(String, default="general")
     system_prompt = Column(Text)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
+    deleted_at = Column(DateTime(timezone=True), nullable=True) # Tombstone, reaped later
 
     # Relationships
     owner = relationship("User", back_populates="chats")
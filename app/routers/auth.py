@@ -1,12 +1,15 @@
 # app/routers/auth.py
-from fastapi import APIRouter, HTTPException, Depends, status
+from fastapi import APIRouter, BackgroundTasks, HTTPException, Depends, Response, status
 from fastapi.security import OAuth2PasswordRequestForm
 from pydantic import BaseModel, EmailStr
-from app.core.database import get_db_connection
+from app.core.database import get_db_connection, mark_write
+from app.core.queries import SELECT_LOGIN_USER
 from app.core.security import get_password_hash, verify_password, create_access_token
 import uuid
 from app.models.models import User
 from app.routers.deps import get_current_user
+from app.core.reaper import tombstone_chats
+from app.core.memory import purge_user_memories
 
 router = APIRouter(prefix="/auth", tags=["Authentication"])
 
@@ -72,14 +75,7 @@ async def login(form_data: OAuth2PasswordRequestForm = Depends(), conn = Depends
     """
     async with conn.cursor() as cur:
         # 1. Fetch User (Allow login by Email OR Username for better UX)
-        await cur.execute(
-            """
-            SELECT user_id, hashed_password 
-            FROM users 
-            WHERE email = %s OR username = %s
-            """, 
-            (form_data.username, form_data.username)
-        )
+        await cur.execute(SELECT_LOGIN_USER, (form_data.username, form_data.username))
         user = await cur.fetchone()
 
         # 2. Verify
@@ -112,4 +108,34 @@ async def read_users_me(current_user: User = Depends(get_current_user)):
         "user_id": str(current_user.user_id),
         "username": current_user.username,
         "email": current_user.email
-    }
\ No newline at end of file
+    }
+
+
+@router.delete("/me")
+async def delete_account(
+    response: Response,
+    background_tasks: BackgroundTasks,
+    current_user: User = Depends(get_current_user),
+    conn = Depends(get_db_connection)
+):
+    """
+    Deletes the current account.
+    The user is deactivated (so the token stops working) and every chat is
+    tombstoned in one transaction. The vectors are purged right after the
+    response; the background reaper then removes messages and finally the user row.
+    """
+    user_id = str(current_user.user_id)
+
+    async with conn.cursor() as cur:
+        await cur.execute(
+            "UPDATE users SET is_active = FALSE, deleted_at = now() WHERE user_id = %s",
+            (user_id,)
+        )
+    await tombstone_chats(conn, user_id)
+    await conn.commit()
+    await mark_write(conn, response)
+
+    # Not left to the reaper: other workers would keep retrieving them until their next sweep
+    background_tasks.add_task(purge_user_memories, user_id)
+
+    return {"msg": "Account scheduled for deletion"}
@@ -1,10 +1,12 @@
 # app/routers/deps.py
 import os
-from fastapi import Depends, HTTPException, status
+import re
+from uuid import UUID
+from fastapi import Depends, HTTPException, Request, status
 from fastapi.security import OAuth2PasswordBearer
 from jose import jwt, JWTError
-from app.core.database import SessionLocal
-from sqlalchemy.orm import Session
+from app.core.database import WRITE_LSN_COOKIE, WRITE_LSN_HEADER, pool, read_connection
+from app.core.queries import SELECT_CURRENT_USER
 # Ensure this import matches your actual file structure
 from app.models.models import User 
 
@@ -16,15 +18,8 @@ ALGORITHM = "HS256"
 # This tells Swagger: "Send the username/password to /auth/login"
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/auth/login")
 
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
-
 # --- 1. Get Current User (Full Object) ---
-async def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)) -> User:
+async def get_current_user(token: str = Depends(oauth2_scheme)) -> User:
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
@@ -39,19 +34,28 @@ async def get_current_user(token: str = Depends(oauth2_scheme), db: Session = De
         
         if user_identifier is None:
             raise credentials_exception
+        # A malformed id would otherwise fail inside Postgres with a 500
+        UUID(user_identifier)
             
-    except JWTError:
+    except (JWTError, ValueError):
         raise credentials_exception
         
     # Fetch user from Postgres
     # NOTE: If your token stores ID in 'sub', search by ID. 
     # If it stores username, search by username.
     # Based on your auth.py, you saved user_id as 'sub'.
-    user = db.query(User).filter(User.user_id == user_identifier).first()
+    # Runs on the async pool (a prepared, warmed-up statement) and gives the
+    # connection back right away instead of holding it for the whole request.
+    async with pool.connection() as conn:
+        cur = await conn.execute(SELECT_CURRENT_USER, (user_identifier,))
+        row = await cur.fetchone()
     
-    if user is None:
+    if row is None:
         raise credentials_exception
 
+    # Detached User with only the columns the endpoints read
+    user = User(user_id=row[0], username=row[1], email=row[2], is_active=row[3])
+
     # CHECK IS_ACTIVE (Security)
     if not user.is_active:
         raise HTTPException(status_code=400, detail="Inactive user")
@@ -60,4 +64,23 @@ async def get_current_user(token: str = Depends(oauth2_scheme), db: Session = De
 
 # --- 2. Get Current User ID (Lightweight version) ---
 async def get_current_user_id(current_user: User = Depends(get_current_user)) -> str:
-    return str(current_user.user_id)
\ No newline at end of file
+    return str(current_user.user_id)
+
+# --- 3. Read-Only DB Connection (Replica when safe) ---
+LSN_PATTERN = re.compile(r"^[0-9A-Fa-f]{1,8}/[0-9A-Fa-f]{1,8}$")
+
+def get_write_lsn(request: Request):
+    """The client's last write position (header first, then cookie), or None if absent or malformed."""
+    lsn = request.headers.get(WRITE_LSN_HEADER) or request.cookies.get(WRITE_LSN_COOKIE)
+    return lsn if lsn and LSN_PATTERN.match(lsn) else None
+
+async def get_read_db_connection(
+    user_id: str = Depends(get_current_user_id),
+    write_lsn = Depends(get_write_lsn)
+):
+    """
+    Dependency for read-only Chat Endpoints (Async).
+    Uses the read replica if one is configured and has caught up with this client's last write.
+    """
+    async with read_connection(write_lsn) as conn:
+        yield conn
\ No newline at end of file
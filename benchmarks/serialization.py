@@ -0,0 +1,85 @@
+# benchmarks/serialization.py
+"""
+Compares the old and new response paths of GET /chat/{chat_id} on a synthetic history.
+
+  old: dict per row -> jsonable_encoder -> json.dumps (what FastAPI does for a returned dict)
+  new: dict per row from tuple unpacking -> orjson (FastJSONResponse)
+
+Both start from the same cursor tuples, so the query itself (identical for both)
+is not part of the timing.
+Also reports bytes on the wire raw, gzipped and brotli-compressed.
+Runs offline:  python benchmarks/serialization.py --messages 5000
+"""
+import argparse
+import gzip
+import json
+import random
+import timeit
+import uuid
+from datetime import datetime, timedelta, timezone
+
+import orjson
+from fastapi.encoders import jsonable_encoder
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+WORDS = "the quick brown fox jumps over a lazy dog while my friend asks how was your day 😀".split()
+
+def make_rows(count: int):
+    """Cursor-like tuples: (role, content, created_at)."""
+    rng = random.Random(42)
+    start = datetime(2024, 1, 1, tzinfo=timezone.utc)
+    return [
+        (
+            "user" if i % 2 == 0 else "ai",
+            " ".join(rng.choice(WORDS) for _ in range(rng.randint(5, 80))),
+            start + timedelta(seconds=i * 30),
+        )
+        for i in range(count)
+    ]
+
+def old_path(chat_id, rows):
+    messages = [{"role": r[0], "content": r[1], "time": r[2]} for r in rows]
+    payload = {"chat_id": chat_id, "chat_name": "bench", "mode": "friend", "messages": messages}
+    # Same settings as starlette's JSONResponse.render
+    return json.dumps(
+        jsonable_encoder(payload), ensure_ascii=False, allow_nan=False, indent=None, separators=(",", ":")
+    ).encode("utf-8")
+
+def new_path(chat_id, rows):
+    return orjson.dumps({
+        "chat_id": chat_id,
+        "chat_name": "bench",
+        "mode": "friend",
+        "messages": [{"role": role, "content": content, "time": time} for role, content, time in rows],
+    })
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--messages", type=int, nargs="+", default=[100, 1000, 10000])
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    chat_id = str(uuid.uuid4())
+    print(f"{'messages':>9} {'old ms':>9} {'new ms':>9} {'speedup':>8} {'raw KB':>9} {'gzip KB':>9} {'br KB':>9}")
+    for count in args.messages:
+        rows = make_rows(count)
+        assert json.loads(old_path(chat_id, rows)) == json.loads(new_path(chat_id, rows))
+
+        number = max(1, 20000 // count)
+        old = min(timeit.repeat(lambda: old_path(chat_id, rows), number=number, repeat=args.repeat)) / number
+        new = min(timeit.repeat(lambda: new_path(chat_id, rows), number=number, repeat=args.repeat)) / number
+
+        body = new_path(chat_id, rows)
+        gz = len(gzip.compress(body, compresslevel=6))
+        br = f"{len(brotli.compress(body, quality=4)) / 1024:9.1f}" if brotli else f"{'n/a':>9}"
+        print(
+            f"{count:>9} {old * 1000:>9.2f} {new * 1000:>9.2f} {old / new:>7.1f}x "
+            f"{len(body) / 1024:>9.1f} {gz / 1024:>9.1f} {br}"
+        )
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+# benchmarks/test_hot_path.py
+import asyncio
+import contextlib
+
+import pytest
+from langchain_core.messages import AIMessage, HumanMessage
+
+from app.agent import workflow
+from app.core.prompts import PERSONALITY_PROMPTS
+from app.core.security import create_access_token
+from app.routers.chat import CreateChatRequest, FanOutRequest, rows_to_messages, sanitize_text
+from app.routers import deps
+
+USER_ID = "3f2b8c1e-6a4d-4c7e-9b1a-2d5e8f0a7c91"
+
+# --- sanitize_text ---
+@pytest.fixture(scope="module")
+def large_text():
+    return ("Hello there, how was your day?\t I went hiking\x00 and saw a bear\x07.\n" * 2000).strip()
+
+@pytest.fixture(scope="module")
+def emoji_text():
+    return " ".join(["😀🔥❤️👍🏽🇮🇳 नमस्ते こんにちは"] * 3000) + "\x1f"
+
+def test_sanitize_large(benchmark, large_text):
+    result = benchmark(sanitize_text, large_text)
+    assert "\x00" not in result
+
+def test_sanitize_emoji(benchmark, emoji_text):
+    result = benchmark(sanitize_text, emoji_text)
+    assert "😀" in result and "\x1f" not in result
+
+# --- get_chat_history row conversion ---
+@pytest.fixture(scope="module")
+def history_rows():
+    # Newest first, as returned by SELECT ... ORDER BY created_at DESC
+    return [("user" if i % 2 else "ai", f"message number {i} " * 10) for i in range(1000)]
+
+def test_rows_to_messages(benchmark, history_rows):
+    history = benchmark(rows_to_messages, history_rows)
+    assert len(history) == 1000
+    assert isinstance(history[-1], AIMessage)
+
+# --- JWT ---
+def test_create_access_token(benchmark):
+    token = benchmark(create_access_token, {"sub": USER_ID})
+    assert token.count(".") == 2
+
+class FakeCursor:
+    def __init__(self, row):
+        self.row = row
+
+    async def fetchone(self):
+        return self.row
+
+class FakeConnection:
+    def __init__(self, row):
+        self.row = row
+
+    async def execute(self, query, params=None):
+        return FakeCursor(self.row)
+
+class FakePool:
+    """Stands in for the psycopg pool so only token decoding and row handling are measured."""
+    def __init__(self, row):
+        self.conn = FakeConnection(row)
+
+    @contextlib.asynccontextmanager
+    async def connection(self):
+        yield self.conn
+
+def test_get_current_user(benchmark, monkeypatch):
+    monkeypatch.setattr(deps, "pool", FakePool((USER_ID, "bench", "bench@example.com", True)))
+    token = create_access_token({"sub": USER_ID})
+    loop = asyncio.new_event_loop()
+    try:
+        user = benchmark(lambda: loop.run_until_complete(deps.get_current_user(token=token)))
+    finally:
+        loop.close()
+    assert user.username == "bench"
+
+# --- Prompt assembly in call_gemini ---
+class StubLLM:
+    async def ainvoke(self, messages):
+        return AIMessage(content=str(len(messages)))
+
+@pytest.fixture
+def stub_llm(monkeypatch):
+    monkeypatch.setattr(workflow, "llm", StubLLM())
+
+def test_call_gemini_prompt_assembly(benchmark, stub_llm):
+    state = {
+        "messages": [HumanMessage(content=f"question {i}") if i % 2 else AIMessage(content=f"answer {i}") for i in range(11)],
+        "user_id": USER_ID,
+        "chat_id": USER_ID,
+        "system_instruction": PERSONALITY_PROMPTS["guide"],
+        "memories": [f"I told you my favourite number is {i}" for i in range(5)],
+        "persist_memory": False,
+    }
+    loop = asyncio.new_event_loop()
+    try:
+        result = benchmark(lambda: loop.run_until_complete(workflow.call_gemini(state)))
+    finally:
+        loop.close()
+    assert result["messages"][0].content == "12"
+
+# --- PERSONALITY_PROMPTS validation ---
+def test_create_chat_validation(benchmark):
+    request = benchmark(CreateChatRequest, chat_name="Weekend plans", personality="Friend")
+    assert request.personality == "friend"
+
+def test_fanout_validation(benchmark):
+    request = benchmark(
+        FanOutRequest, chat_id=USER_ID, message="hi", personalities=[p.upper() for p in PERSONALITY_PROMPTS]
+    )
+    assert request.personalities == list(PERSONALITY_PROMPTS)
@@ -0,0 +1,10 @@
+#!/bin/bash
+# Runs once when the primary's data directory is created:
+# adds the role and pg_hba rule the replica uses for streaming replication.
+set -e
+
+psql -v ON_ERROR_STOP=1 --username "$POSTGRES_USER" --dbname "$POSTGRES_DB" <<-SQL
+    CREATE ROLE replicator WITH REPLICATION LOGIN PASSWORD 'replicator';
+SQL
+
+echo "host replication replicator all scram-sha-256" >> "$PGDATA/pg_hba.conf"